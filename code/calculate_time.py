@@ -1,58 +1,57 @@
+import glob
+import mmap
 import os
 import re
 
-def parse_logs(log_dir="/mnt/data/use_cases/logs/"):
-    # Patterns to match filenames
-    clean_pattern = re.compile(r"clean_job_.*\.out")
-    hi_pattern = re.compile(r"analysis_HI_.*\.out")
-    hw_pattern = re.compile(r"analysis_HW_.*\.out")
+# Patterns to extract time from content (as bytes, to scan logs without decoding)
+# Clean: "Time Taken: 13.3932 seconds"
+CLEAN_TIME_MARKER = b"Time Taken:"
+CLEAN_TIME_REGEX = re.compile(rb"Time Taken:\s+([\d\.]+)\s+seconds")
+# Analysis: "Total Execution Time: 55.4712 seconds"
+ANALYSIS_TIME_MARKER = b"Total Execution Time:"
+ANALYSIS_TIME_REGEX = re.compile(rb"Total Execution Time:\s+([\d\.]+)\s+seconds")
 
-    # Patterns to extract time from content
-    # Clean: "Time Taken: 13.3932 seconds"
-    clean_time_regex = re.compile(r"Time Taken:\s+([\d\.]+)\s+seconds")
-    # Analysis: "Total Execution Time: 55.4712 seconds"
-    analysis_time_regex = re.compile(r"Total Execution Time:\s+([\d\.]+)\s+seconds")
+def sum_log_times(log_dir, filename_pattern, marker, time_regex):
+    """
+    Sum the times reported in every log file matching a glob pattern.
 
-    total_clean_time = 0.0
-    total_hi_time = 0.0
-    total_hw_time = 0.0
-    
-    file_counts = {"clean": 0, "hi": 0, "hw": 0}
+    Logs are memory-mapped and only the tail starting at the last marker
+    is searched, since the timing line is printed at the end of each job.
+    """
+    total_time = 0.0
+    file_count = 0
 
-    print(f"Scanning directory: {os.path.abspath(log_dir)}\n")
+    for filepath in glob.glob(os.path.join(log_dir, filename_pattern)):
+        with open(filepath, 'rb') as f:
+            # mmap can't map empty files (e.g. jobs that died before printing)
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
 
-    for filename in os.listdir(log_dir):
-        filepath = os.path.join(log_dir, filename)
-        
-        # 1. Check for Cleaning Logs
-        if clean_pattern.match(filename):
-            with open(filepath, 'r') as f:
-                content = f.read()
-                match = clean_time_regex.search(content)
-                if match:
-                    t = float(match.group(1))
-                    total_clean_time += t
-                    file_counts["clean"] += 1
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = mm.rfind(marker)
+                if start == -1:
+                    continue
 
-        # 2. Check for Heat Index Logs
-        elif hi_pattern.match(filename):
-            with open(filepath, 'r') as f:
-                content = f.read()
-                match = analysis_time_regex.search(content)
+                match = time_regex.match(mm, start)
                 if match:
-                    t = float(match.group(1))
-                    total_hi_time += t
-                    file_counts["hi"] += 1
+                    total_time += float(match.group(1))
+                    file_count += 1
 
-        # 3. Check for Heat Wave Logs
-        elif hw_pattern.match(filename):
-            with open(filepath, 'r') as f:
-                content = f.read()
-                match = analysis_time_regex.search(content)
-                if match:
-                    t = float(match.group(1))
-                    total_hw_time += t
-                    file_counts["hw"] += 1
+    return total_time, file_count
+
+def parse_logs(log_dir="/mnt/data/use_cases/logs/"):
+    print(f"Scanning directory: {os.path.abspath(log_dir)}\n")
+
+    # 1. Cleaning Logs
+    total_clean_time, clean_count = sum_log_times(log_dir, "clean_job_*.out", CLEAN_TIME_MARKER, CLEAN_TIME_REGEX)
+
+    # 2. Heat Index Logs
+    total_hi_time, hi_count = sum_log_times(log_dir, "analysis_HI_*.out", ANALYSIS_TIME_MARKER, ANALYSIS_TIME_REGEX)
+
+    # 3. Heat Wave Logs
+    total_hw_time, hw_count = sum_log_times(log_dir, "analysis_HW_*.out", ANALYSIS_TIME_MARKER, ANALYSIS_TIME_REGEX)
+
+    file_counts = {"clean": clean_count, "hi": hi_count, "hw": hw_count}
 
     # --- Print Results ---
     grand_total_seconds = total_clean_time + total_hi_time + total_hw_time
@@ -1,18 +1,52 @@
 import pandas as pd
+import numpy as np
+from numba import njit
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import sys
 import os
 import time
 import re
 
-def clean_weather_data(input_csv, output_dir):
+# Matches both "weather_<year>" & "weather_<year>_part_<num>" file names
+SPLIT_NAME_REGEX = re.compile(r"weather_(\d{4})(?:_part_(\d+))?")
+
+@njit(cache=True)
+def fill_gaps(values):
+    """
+    Impute a float column in place in a single pass:
+    forward fill, then backward fill the leading gap, then 0 if nothing is valid.
+
+    Returns the missing counts seen before ffill, before bfill & before the 0 fill.
+    """
+    missing = 0
+    first_valid = -1
+    last = np.nan
+
+    for i in range(values.shape[0]):
+        if np.isnan(values[i]):
+            missing += 1
+            values[i] = last  # stays NaN until the first valid value
+        else:
+            if first_valid == -1:
+                first_valid = i
+            last = values[i]
+
+    if first_valid == -1:
+        values[:] = 0
+        return missing, missing, missing
+
+    values[:first_valid] = values[first_valid]
+    return missing, first_valid, 0
+
+def clean_weather_data(input_file, output_dir, verbose=False):
     # Extract filename without path
-    base = os.path.basename(input_csv)
+    base = os.path.basename(input_file)
 
     year = None
     part_idx = None
 
-    # Regex to match both forms
-    m = re.match(r"weather_(\d{4})(?:_part_(\d+))?", base)
+    m = SPLIT_NAME_REGEX.match(base)
     if m:
         year = int(m.group(1))
         if m.group(2):
@@ -22,47 +56,77 @@ def clean_weather_data(input_csv, output_dir):
     out_name = f"clean_{year}" if year is not None else "clean"
     if part_idx is not None:
         out_name += f"_part_{part_idx:02d}"
-    output_file = os.path.join(output_dir, out_name + ".csv")
+    output_file = os.path.join(output_dir, out_name + ".parquet")
 
     start_time = time.time()
-    print(f"Starting job for: {input_csv}")
+    print(f"Starting job for: {input_file}")
 
-    # Read data
+    # Read data (split parts are Parquet, CSV is still accepted)
     try:
-        df = pd.read_csv(input_csv)
+        if input_file.endswith(".parquet"):
+            df = pq.read_table(input_file).to_pandas()
+        else:
+            df = pacsv.read_csv(
+                input_file,
+                read_options=pacsv.ReadOptions(block_size=64 << 20, use_threads=True),
+                convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+            ).to_pandas()
     except Exception as e:
-        print(f"ERROR: Cannot read {input_csv}: {e}")
+        print(f"ERROR: Cannot read {input_file}: {e}")
         sys.exit(1)
 
     original_rows = len(df)
 
     # Drop columns with more than 50% rows empty
     limit = len(df) * 0.5
-    original_cols = df.columns.tolist()
+    original_cols = df.columns
     df = df.dropna(axis=1, thresh=limit)
 
-    dropped_cols = list(set(original_cols) - set(df.columns))
+    dropped_cols = original_cols.difference(df.columns, sort=False).tolist()
     if dropped_cols:
         print(f"  -> Dropped {len(dropped_cols)} empty/sparse columns: {dropped_cols}")
 
-    # Impute missing data
-    # 1. Forward Fill
-    missing_before = df.isna().sum().sum()
-    print(f"  -> Filling gaps forward (ffill)... (Missing values: {missing_before})")
-    df = df.ffill()
-
-    # 2. Backward Fill
-    missing_middle = df.isna().sum().sum()
-    print(f"  -> Filling start gaps backward (bfill)... (Remaining missing: {missing_middle})")
-    df = df.bfill()
-
-    # 3. Fill NaNs with 0
-    missing_last = df.isna().sum().sum()
-    if missing_last > 0:
-        print(f"  -> Safety net: Filling {missing_last} remaining NaNs with 0...")
-        df = df.fillna(0)
+    # Impute missing data: 1. Forward Fill, 2. Backward Fill, 3. Fill NaNs with 0
+    # (missing counts are free for float columns, other columns are only counted if verbose)
+    missing_before = missing_middle = missing_last = 0
+
+    # Float columns go through the fused Numba kernel
+    float_cols = df.select_dtypes(include='floating').columns
+    for col in float_cols:
+        values = df[col].to_numpy(copy=True)
+        before, middle, last = fill_gaps(values)
+        df[col] = values
+        missing_before += before
+        missing_middle += middle
+        missing_last += last
+
+    # Other columns (text, datetime) fall back to pandas
+    other_cols = df.columns.difference(float_cols, sort=False)
+    if len(other_cols) > 0:
+        others = df[other_cols]
+        if verbose:
+            missing_before += others.isna().sum().sum()
+            others = others.ffill()
+            missing_middle += others.isna().sum().sum()
+            others = others.bfill()
+            missing_last += others.isna().sum().sum()
+            df[other_cols] = others.fillna(0)
+        else:
+            df[other_cols] = others.ffill().bfill().fillna(0)
+
+    if verbose:
+        print(f"  -> Filled gaps forward (ffill)... (Missing values: {missing_before})")
+        print(f"  -> Filled start gaps backward (bfill)... (Remaining missing: {missing_middle})")
+        if missing_last > 0:
+            print(f"  -> Safety net: Filled {missing_last} remaining NaNs with 0.")
+        else:
+            print("  -> No remaining NaNs to fill with 0.")
     else:
-        print("  -> No remaining NaNs to fill with 0.")
+        print("  -> Filled missing values (ffill, then bfill, then 0)")
+
+    # Parquet keeps column types, so store datetime as a real timestamp
+    # (unparseable values become NaT and are dropped by the analysis jobs)
+    df['datetime'] = pd.to_datetime(df['datetime'], format='ISO8601', errors='coerce')
 
     # Logic: Sanity checks (Physics enforcement)
     sanity_limits = {
@@ -76,19 +140,22 @@ def clean_weather_data(input_csv, output_dir):
         'visibility': (0, 100)       
     }
 
+    # Case-insensitive matching (e.g. 'Humidity' matches 'humidity')
+    col_map = {c.lower(): c for c in df.columns}
+
     for col, (min_val, max_val) in sanity_limits.items():
-        # Case-insensitive matching (e.g. 'Humidity' matches 'humidity')
-        matching_cols = [c for c in df.columns if c.lower() == col.lower()]
+        found_col = col_map.get(col)
+        if found_col is None:
+            continue
+
+        # Check for bad values (on the raw array, no intermediate Series)
+        values = df[found_col].to_numpy()
+        bad_count = np.count_nonzero((values < min_val) | (values > max_val))
         
-        for found_col in matching_cols:
-            # Check for bad values
-            bad_mask = (df[found_col] < min_val) | (df[found_col] > max_val)
-            bad_count = bad_mask.sum()
-            
-            if bad_count > 0:
-                print(f"  -> Fixing {bad_count} abnormal values in '{found_col}' (Capping to {min_val}-{max_val})")
-                # Clip forces values into the specific range
-                df[found_col] = df[found_col].clip(lower=min_val, upper=max_val)
+        if bad_count > 0:
+            print(f"  -> Fixing {bad_count} abnormal values in '{found_col}' (Capping to {min_val}-{max_val})")
+            # Clip forces values into the specific range
+            df[found_col] = np.clip(values, min_val, max_val)
 
     base_name = "clean"
     if year is not None:
@@ -97,26 +164,27 @@ def clean_weather_data(input_csv, output_dir):
         base_name += f"_part_{part_idx:02d}"
 
     os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, f"{base_name}.csv")
+    output_file = os.path.join(output_dir, f"{base_name}.parquet")
 
-    df.to_csv(output_file, index=False)
+    df.to_parquet(output_file, engine='pyarrow', compression='snappy', row_group_size=500_000, index=False)
 
     duration = time.time() - start_time
     print(f"\n{'='*60}")
     print(f"Processing Complete!")
     print(f"{'='*60}")
-    print(f"File: {input_csv}")
+    print(f"File: {input_file}")
     print(f"Rows: {original_rows}")
     print(f"Time Taken: {duration:.4f} seconds")
     print(f"Saved to: {output_file}")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python3 clean_data.py <input_csv> <output_dir>")
+    args = [arg for arg in sys.argv[1:] if arg != "--verbose"]
+    if len(args) != 2:
+        print("Usage: python3 clean_data.py <input_parquet> <output_dir> [--verbose]")
         sys.exit(1)
 
-    input_csv = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_file = args[0]
+    output_dir = args[1]
     
-    clean_weather_data(input_csv, output_dir)
+    clean_weather_data(input_file, output_dir, verbose="--verbose" in sys.argv[1:])
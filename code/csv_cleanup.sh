@@ -1,9 +1,9 @@
 #!/bin/bash
 set -e
 
-echo "Removing intermediate CSV files..."
+echo "Removing intermediate files..."
 
-rm -f /mnt/data/use_cases/clean_weather.csv
+rm -f /mnt/data/use_cases/clean_weather.parquet
 rm -f /mnt/data/use_cases/expanded_weather.csv
 rm -f /mnt/data/use_cases/sorted_weather.csv
 
@@ -1,112 +1,235 @@
-import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import multiprocessing
 import os
+import shutil
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-def expand_data(input_file, output_file, target_size_gb, chunk_size):
+# Data shared with the sensor worker processes (inherited through fork, not copied):
+# the columns every sensor copies as-is, and the readings every sensor adds noise to
+_SHARED = {}
+
+def shard_path(output_file, sensor_id):
+    """Where a single sensor copy is written"""
+    if output_file.endswith(".parquet"):
+        # Hive-partitioned Parquet dataset, can be scanned in parallel as-is
+        return os.path.join(output_file, f"sensor={sensor_id:02d}", "part.parquet")
+    return f"{output_file}.sensor_{sensor_id:02d}"
+
+def csv_size_gb(input_file, table):
+    """
+    Size of the input as CSV (the target size is in CSV terms).
+    Parquet input is compressed, so its CSV size is estimated from a sample of rows.
+    """
+    if not input_file.endswith(".parquet"):
+        return os.path.getsize(input_file) / (1024**3)
+
+    sample = table.slice(0, 100_000)
+    if sample.num_rows == 0:
+        return os.path.getsize(input_file) / (1024**3)
+    buf = pa.BufferOutputStream()
+    pacsv.write_csv(sample, buf)
+    return (buf.tell() / sample.num_rows) * table.num_rows / (1024**3)
+
+def make_sensor(task):
+    """
+    Write one sensor copy of the shared dataset (with its own noise) to its shard file.
+    Runs in a worker process, returns the number of rows written.
+    """
+    sensor_id, num_duplicates, sensor_seed, out_path = task
+    schema = _SHARED['schema']
+    static_table = _SHARED['static_table']
+    readings = _SHARED['readings']
+    numeric_cols = _SHARED['numeric_cols']
+    scales = _SHARED['scales'][:, np.newaxis]
+    chunk_size = _SHARED['chunk_size']
+    num_rows = static_table.num_rows
+
+    sensor_start = time.time()
+    rng = np.random.default_rng(sensor_seed)
+    print(f"\nProcessing Sensor {sensor_id + 1}/{num_duplicates}...", flush=True)
+
+    # Shard is opened once & streamed into (CSV shards have no header, it's added when combining)
+    if out_path.endswith(".parquet"):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        sink = pa.OSFile(out_path, 'wb')
+        writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    else:
+        sink = open(out_path, 'wb', buffering=16 << 20)
+        writer = pacsv.CSVWriter(sink, schema, write_options=pacsv.WriteOptions(include_header=False))
+
+    total_chunks = int(np.ceil(num_rows / chunk_size))
+    rows_written = 0
+    bytes_written = 0  # tracked locally, so progress never has to stat the growing file
+
+    # Process in chunks to manage memory
+    for chunk_num in range(total_chunks):
+        start_idx = chunk_num * chunk_size
+        end_idx = min((chunk_num + 1) * chunk_size, num_rows)
+        
+        # Add sensor-specific noise to numeric columns
+        # Each sensor has slightly different calibration
+        # (missing values stay NaN, so no mask is needed)
+        values = rng.standard_normal((len(numeric_cols), end_idx - start_idx))
+        values *= scales
+        values += 1
+        values *= readings[:, start_idx:end_idx]
+        np.round(values, 2, out=values)
+
+        # Static columns are zero-copy slices of the shared table
+        chunk_columns = dict(zip(static_table.column_names, static_table.slice(start_idx, end_idx - start_idx).columns))
+        for i, col in enumerate(numeric_cols):
+            chunk_columns[col] = pa.array(values[i], type=schema.field(col).type, from_pandas=True)
+        table_chunk = pa.Table.from_arrays([chunk_columns[name] for name in schema.names], schema=schema)
+
+        rows_written += table_chunk.num_rows
+
+        # Write chunk to shard
+        writer.write_table(table_chunk)
+        bytes_written = sink.tell()
+        
+        # Progress update
+        if (chunk_num + 1) % 10 == 0 or chunk_num == total_chunks - 1:
+            progress = ((chunk_num + 1) / total_chunks) * 100
+
+            elapsed = time.time() - sensor_start
+            rate_mb_s = (bytes_written / 1e6) / elapsed
+
+            print(
+                f"  Sensor {sensor_id + 1} Progress: {progress:.1f}% | "
+                f"Rows written: {rows_written:,} | "
+                f"Elapsed: {elapsed:.1f}s | "
+                f"Rate: {rate_mb_s:.1f} MB/s",
+                flush=True
+            )
+
+    writer.close()
+    sink.close()
+
+    sensor_elapsed = time.time() - sensor_start
+    print(
+        f"Finished Sensor {sensor_id + 1} "
+        f"in {sensor_elapsed:.1f}s "
+        f"({sensor_elapsed / 60:.2f} min)",
+        flush=True
+    )
+    return rows_written
+
+def expand_data(input_file, output_file, target_size_gb, chunk_size, workers=None, seed=None):
     """
     Duplicate dataset with slight variations to simulate multiple sensors
 
     Concept: Each duplicate represents a different sensor at the same location
     taking slightly different readings due to sensor calibration differences
+
+    Sensor copies are independent, so they are generated in parallel by up to
+    `workers` processes (default: all cores), each writing its own shard.
+    Output is written as a Parquet dataset (one part per sensor) if output_file
+    ends with .parquet, otherwise the shards are combined into one CSV
+    (the sort step of the pipeline needs CSV)
+
+    Pass a seed to make the generated noise reproducible
     """
 
     start_time = time.time()
     print("Starting data expansion...\n")
 
     print(f"Reading input file: {input_file}...")
-    df = pd.read_csv(input_file)
+    if input_file.endswith(".parquet"):
+        table = pq.read_table(input_file)
+    else:
+        table = pacsv.read_csv(
+            input_file,
+            read_options=pacsv.ReadOptions(block_size=64 << 20, use_threads=True),
+            convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+        )
     
     # Calculate how many duplicates we need
-    original_size_gb = os.path.getsize(input_file) / (1024**3)
+    original_size_gb = csv_size_gb(input_file, table)
     num_duplicates = int(target_size_gb / original_size_gb)
+    num_workers = max(1, min(workers or os.cpu_count(), num_duplicates))
     
     print(f"\n{'='*60}")
     print(f"SENSOR DUPLICATION SETUP")
     print(f"{'='*60}")
     print(f"Original size: {original_size_gb:.2f} GB")
-    print(f"Original rows: {len(df):,}")
+    print(f"Original rows: {table.num_rows:,}")
     print(f"Target size: {target_size_gb} GB")
     print(f"Number of sensor copies: {num_duplicates}")
-    print(f"Final rows: ~{len(df) * num_duplicates:,}")
+    print(f"Final rows: ~{table.num_rows * num_duplicates:,}")
     print(f"Expected size: ~{original_size_gb * num_duplicates:.2f} GB")
+    print(f"Worker processes: {num_workers}")
     print(f"\nInterpretation: {num_duplicates} sensors at each location")
     print(f"{'='*60}\n")
     
-    # Identify numeric columns
-    numeric_cols = ['temperature', 'pressure', 'dew_point', 'humidity', 'wind_speed', 'wind_chill']
+    # Identify numeric columns & their noise levels (different for different measurements)
+    noise_scales = {
+        'temperature': 0.02,
+        'pressure': 0.005,
+        'dew_point': 0.02,
+        'humidity': 0.02,
+        'wind_speed': 0.05,
+        'wind_chill': 0.02
+    }
+    numeric_cols = [col for col in noise_scales if col in table.column_names]
+    scales = np.array([noise_scales[col] for col in numeric_cols])
+
+    # Split off the readings once as one (columns x rows) float block (nulls -> NaN),
+    # everything else is shared as Arrow columns
+    # (noisy readings are written as float64 if the input held whole numbers)
+    schema = table.schema
+    for col in numeric_cols:
+        field = schema.field(col)
+        if not pa.types.is_floating(field.type):
+            schema = schema.set(schema.get_field_index(col), field.with_type(pa.float64()))
+    readings = np.array(
+        [table[col].to_numpy().astype(np.float64) for col in numeric_cols],
+        dtype=np.float64
+    ).reshape(len(numeric_cols), table.num_rows)
+    table = table.drop_columns(numeric_cols)
+
+    # One independent random stream per sensor
+    sensor_seeds = np.random.SeedSequence(seed).spawn(num_duplicates)
+
+    _SHARED.update(
+        schema=schema,
+        static_table=table,
+        readings=readings,
+        numeric_cols=numeric_cols,
+        scales=scales,
+        chunk_size=chunk_size
+    )
+    tasks = [
+        (sensor_id, num_duplicates, sensor_seeds[sensor_id], shard_path(output_file, sensor_id))
+        for sensor_id in range(num_duplicates)
+    ]
     
-    # Write header
     print(f"Writing to {output_file}...")
-    df.head(0).to_csv(output_file, index=False, mode='w')
-    
-    total_chunks = int(np.ceil(len(df) / chunk_size))
+    sys.stdout.flush()  # don't let forked workers inherit unflushed output
 
-    total_rows_written = 0
+    # Create each sensor copy (fork so workers share the data instead of pickling it)
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        total_rows_written = sum(executor.map(make_sensor, tasks))
+
+    shard_paths = [task[3] for task in tasks]
+    output_size_gb = sum(os.path.getsize(path) for path in shard_paths) / (1024**3)
+
+    if not output_file.endswith(".parquet"):
+        # Combine CSV shards behind a single header
+        print(f"\nCombining {len(shard_paths)} sensor shards into {output_file}...")
+        with open(output_file, 'wb') as out:
+            pacsv.write_csv(schema.empty_table(), out)
+            for path in shard_paths:
+                with open(path, 'rb') as shard:
+                    shutil.copyfileobj(shard, out, 16 << 20)
+                os.remove(path)
+        output_size_gb = os.path.getsize(output_file) / (1024**3)
 
-    # Create each sensor copy
-    for sensor_id in range(num_duplicates):
-        sensor_start = time.time()
-        print(f"\nProcessing Sensor {sensor_id + 1}/{num_duplicates}...")
-        
-        # Process in chunks to manage memory
-        for chunk_num in range(total_chunks):
-            start_idx = chunk_num * chunk_size
-            end_idx = min((chunk_num + 1) * chunk_size, len(df))
-            
-            df_chunk = df.iloc[start_idx:end_idx].copy()
-            
-            # Add sensor-specific noise to numeric columns
-            # Each sensor has slightly different calibration
-            for col in numeric_cols:
-                mask = df_chunk[col].notna()
-                if mask.any():
-                    # Different noise levels for different measurements
-                    if col == 'temperature' or col == 'dew_point' or col == 'wind_chill':
-                        noise_scale = 0.02
-                    elif col == 'pressure':
-                        noise_scale = 0.005
-                    elif col == 'humidity':
-                        noise_scale = 0.02
-                    elif col == 'wind_speed':
-                        noise_scale = 0.05
-                    
-                    # Generate noise for this sensor
-                    noise = np.random.normal(0, noise_scale, size=len(df_chunk))
-                    df_chunk.loc[mask, col] = (
-                        df_chunk.loc[mask, col] * (1 + noise[mask])
-                    ).round(2)
-
-            rows_written = len(df_chunk)
-            total_rows_written += rows_written
-
-            # Write chunk to file
-            df_chunk.to_csv(output_file, index=False, mode='a', header=False)
-            
-            # Progress update
-            if (chunk_num + 1) % 10 == 0 or chunk_num == total_chunks - 1:
-                progress = ((sensor_id * total_chunks + chunk_num + 1) / (num_duplicates * total_chunks)) * 100
-
-                elapsed = time.time() - start_time
-                rate_mb_s = (os.path.getsize(output_file) / 1e6) / elapsed
-
-                print(
-                    f"  Progress: {progress:.1f}% | "
-                    f"Rows written: {total_rows_written:,} | "
-                    f"Elapsed: {elapsed:.1f}s | "
-                    f"Rate: {rate_mb_s:.1f} MB/s"
-                )
-
-        sensor_elapsed = time.time() - sensor_start
-        print(
-            f"Finished Sensor {sensor_id + 1} "
-            f"in {sensor_elapsed:.1f}s "
-            f"({sensor_elapsed / 60:.2f} min)"
-        )
-    
     # Final statistics
-    output_size_gb = os.path.getsize(output_file) / (1024**3)
     total_elapsed = time.time() - start_time
     
     print(f"\n{'='*60}")
@@ -121,12 +244,14 @@ def expand_data(input_file, output_file, target_size_gb, chunk_size):
 if __name__ == "__main__":
     TARGET_SIZE_GB = 10
     CHUNK_SIZE = 500000
+    WORKERS = None
 
     if len(sys.argv) <= 2:
         print(
             "Usage: python3 expand_data.py "
-            "<input_csv> <output_csv> "
-            "<target_size_gb [default 10]> <chunk_size [default 500000]"
+            "<input_csv|input_parquet> <output_csv|output_parquet> "
+            "<target_size_gb [default 10]> <chunk_size [default 500000]> "
+            "<workers [default all cores]>"
         )
         sys.exit(1)
         
@@ -137,5 +262,7 @@ if __name__ == "__main__":
         TARGET_SIZE_GB = float(sys.argv[3])
     if len(sys.argv) > 4:
         CHUNK_SIZE = int(sys.argv[4])
+    if len(sys.argv) > 5:
+        WORKERS = int(sys.argv[5])
 
-    expand_data(INPUT_FILE, OUTPUT_FILE, TARGET_SIZE_GB, CHUNK_SIZE)
+    expand_data(INPUT_FILE, OUTPUT_FILE, TARGET_SIZE_GB, CHUNK_SIZE, WORKERS)
@@ -2,8 +2,37 @@ import sys
 import os
 import glob
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
 from datetime import datetime
 
+# Column types for reading the per-part heat wave CSVs (dates stay as ISO text for
+# sorting & the report, unlike task_heat_waves.HEAT_WAVES_WRITE_SCHEMA which writes date32)
+HEAT_WAVES_READ_SCHEMA = pa.schema([
+    ('state', pa.string()),
+    ('start_date', pa.string()),
+    ('end_date', pa.string()),
+    ('duration_days', pa.int32()),
+    ('avg_temperature', pa.float64())
+])
+
+def read_csv_files(files, schema):
+    """
+    Parse many CSVs in parallel into one DataFrame with fixed column types.
+
+    An explicit schema is needed anyway since header-only files would
+    otherwise infer null-typed columns.
+    """
+    csv_format = ds.CsvFileFormat(
+        convert_options=pacsv.ConvertOptions(
+            column_types=schema,
+            null_values=['', 'NA', 'nan', 'NaN'],
+            strings_can_be_null=True
+        )
+    )
+    return ds.dataset(files, schema=schema, format=csv_format).to_table().to_pandas()
+
 def generate_text_summary(df_hw, df_hi, output_file):
     """Generates a human-readable text report."""
     summary = []
@@ -75,15 +104,21 @@ def aggregate_results(analysis_dir, output_dir):
 
     if hw_files:
         print(f"Merging {len(hw_files)} heat wave files...")
-        full_hw = pd.concat((pd.read_csv(f) for f in hw_files), ignore_index=True)
         
         # --- FIX: SANITIZE DATA TYPES ---
-        # Force 'duration_days' and 'avg_temperature' to numeric.
+        # Numbers are typed while parsing; only if some file holds garbage
+        # fall back to reading text & forcing to numeric.
         # errors='coerce' turns "bad string" into NaN
-        full_hw['duration_days'] = pd.to_numeric(full_hw['duration_days'], errors='coerce')
-        full_hw['avg_temperature'] = pd.to_numeric(full_hw['avg_temperature'], errors='coerce')
+        try:
+            full_hw = read_csv_files(hw_files, HEAT_WAVES_READ_SCHEMA)
+        except pa.ArrowInvalid as e:
+            print(f"Bad values in heat wave files ({e}), coercing to numeric...")
+            text_schema = pa.schema([(name, pa.string()) for name in HEAT_WAVES_READ_SCHEMA.names])
+            full_hw = read_csv_files(hw_files, text_schema)
+            full_hw['duration_days'] = pd.to_numeric(full_hw['duration_days'], errors='coerce')
+            full_hw['avg_temperature'] = pd.to_numeric(full_hw['avg_temperature'], errors='coerce')
         
-        # Remove any rows that became NaN (garbage data cleanup)
+        # Remove any rows with missing values (garbage data cleanup)
         full_hw = full_hw.dropna(subset=['duration_days', 'avg_temperature'])
         # --------------------------------
         
@@ -96,29 +131,31 @@ def aggregate_results(analysis_dir, output_dir):
         print(f"Saved CSV: {out_path}")
     
     # 2. HEAT INDEX (Weighted Average Aggregation)
-    hi_pattern = os.path.join(analysis_dir, "heat_index_*.csv")
+    hi_pattern = os.path.join(analysis_dir, "heat_index_*.parquet")
     hi_files = glob.glob(hi_pattern)
     full_hi = pd.DataFrame()
 
     if hi_files:
         print(f"Merging {len(hi_files)} heat index files...")
-        raw_hi = pd.concat((pd.read_csv(f) for f in hi_files), ignore_index=True)
+        raw_hi = pd.read_parquet(hi_files, engine='pyarrow')
         
-        # --- FIX: SANITIZE DATA TYPES ---
-        cols_to_fix = ['min_heat_index', 'max_heat_index', 'avg_heat_index', 'sample_count']
-        for col in cols_to_fix:
-            if col in raw_hi.columns:
-                 raw_hi[col] = pd.to_numeric(raw_hi[col], errors='coerce')
-        raw_hi = raw_hi.dropna(subset=cols_to_fix)
-        # --------------------------------
+        # Parquet is already typed, only drop rows with missing values
+        raw_hi = raw_hi.dropna(subset=['min_heat_index', 'max_heat_index', 'avg_heat_index', 'sample_count'])
 
         print("Re-aggregating split months...")
-        full_hi = raw_hi.groupby(['state', 'year', 'month']).agg({
-            'min_heat_index': 'min',
-            'max_heat_index': 'max',
-            'avg_heat_index': lambda x: (x * raw_hi.loc[x.index, 'sample_count']).sum() / raw_hi.loc[x.index, 'sample_count'].sum(),
-            'sample_count': 'sum'
-        }).reset_index()
+        # Weighted average = sum(avg * count) / sum(count), summed per group
+        raw_hi['weighted_heat_index'] = raw_hi['avg_heat_index'] * raw_hi['sample_count']
+        full_hi = raw_hi.groupby(['state', 'year', 'month']).agg(
+            min_heat_index=('min_heat_index', 'min'),
+            max_heat_index=('max_heat_index', 'max'),
+            weighted_heat_index=('weighted_heat_index', 'sum'),
+            sample_count=('sample_count', 'sum')
+        ).reset_index()
+        full_hi.insert(
+            full_hi.columns.get_loc('weighted_heat_index'),
+            'avg_heat_index',
+            full_hi.pop('weighted_heat_index') / full_hi['sample_count']
+        )
 
         # Rounding
         cols = ['min_heat_index', 'max_heat_index', 'avg_heat_index']
@@ -1,32 +1,100 @@
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import multiprocessing
+import os
 import time
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Columns to keep (Drop mostly empty ones - determined from dataset website)
+KEEP_COLUMNS = [
+    'datetime',
+    'place',
+    'city',
+    'state',
+    'temperature',
+    'pressure',
+    'dew_point',
+    'humidity',
+    'wind_speed',
+    'wind_chill'
+]
+
+# Fixed types for every chunk: text stays text & readings are parsed straight to float32
+COLUMN_TYPES = {
+    'datetime': pa.string(),
+    'place': pa.string(),
+    'city': pa.string(),
+    'state': pa.string(),
+    'temperature': pa.float32(),
+    'pressure': pa.float32(),
+    'dew_point': pa.float32(),
+    'humidity': pa.float32(),
+    'wind_speed': pa.float32(),
+    'wind_chill': pa.float32()
+}
+
+def chunk_ranges(input_file, chunk_bytes):
+    """
+    Split the file after its header into byte ranges of about chunk_bytes,
+    each ending on a line boundary. Returns the header line & the ranges.
+    """
+    ranges = []
+    with open(input_file, 'rb') as f:
+        header = f.readline()
+        file_size = os.fstat(f.fileno()).st_size
+        start = f.tell()
+        while start < file_size:
+            f.seek(min(start + chunk_bytes, file_size))
+            f.readline()  # move to the end of the current line
+            end = min(f.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+def clean_chunk(task):
+    """
+    Parse & filter one byte range of the CSV in a worker process.
+    Returns the cleaned table & the number of rows read.
+    """
+    input_file, header, start, end = task
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    table = pacsv.read_csv(
+        pa.py_buffer(header + data),
+        read_options=pacsv.ReadOptions(use_threads=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=KEEP_COLUMNS,
+            column_types=COLUMN_TYPES,
+            strings_can_be_null=True
+        )
+    )
+    rows_read = table.num_rows
+
+    # Drop rows if both humidity & temperature are missing
+    table = table.filter(pc.or_(pc.is_valid(table['humidity']), pc.is_valid(table['temperature'])))
+    return table, rows_read
 
-def initial_clean(input_file, output_file, chunksize):
+def initial_clean(input_file, output_file, chunksize, workers=None):
     """
     Clean raw weather CSV by:
     - Keeping selected columns
     - Dropping rows where BOTH humidity and temperature are missing
-    - Downcasting float64 to float32
+    - Reading the readings as float32
 
     This helps prevent the expansion script from duplicating too many missing values
+
+    The CSV is cut into line-aligned chunks of roughly `chunksize` rows, parsed &
+    filtered with pyarrow by up to `workers` processes (default: all cores), and
+    written in order by this process. Output is written as Parquet (typed, no float
+    re-formatting) if output_file ends with .parquet, otherwise as CSV
     """
 
-    # Columns to keep (Drop mostly empty ones - determined from dataset website)
-    KEEP_COLUMNS = [
-        'datetime',
-        'place',
-        'city',
-        'state',
-        'temperature',
-        'pressure',
-        'dew_point',
-        'humidity',
-        'wind_speed',
-        'wind_chill'
-    ]
-
-    first_chunk = True
     total_rows_read = 0
     total_rows_written = 0
     chunk_idx = 0
@@ -34,44 +102,51 @@ def initial_clean(input_file, output_file, chunksize):
     start_time = time.time()
     print("Starting initial CSV cleaning...\n")
 
-    for chunk in pd.read_csv(input_file, usecols=KEEP_COLUMNS,  chunksize=chunksize, low_memory=True):
-        chunk_idx += 1
-        rows_before = len(chunk)
-        total_rows_read += rows_before
-        print(f"Chunk {chunk_idx}: read {rows_before:,} rows")
-
-        # Drop rows if both humidity & temperature are missing
-        chunk.dropna(
-            axis=0,
-            subset=['humidity', 'temperature'],
-            how='all',
-            inplace=True
-        )
-
-        rows_after = len(chunk)
-        removed = rows_before - rows_after
-        total_rows_written += rows_after
-        print(f"  ├─ removed {removed:,} invalid rows")
-        print(f"  ├─ remaining {rows_after:,} rows")
-
-        # Downcast floats to reduce memory
-        float_cols = chunk.select_dtypes(include='float64').columns
-        if len(float_cols) > 0:
-            print(f"  ├─ downcasting {len(float_cols)} float columns")
-            for col in float_cols:
-                chunk[col] = chunk[col].astype('float32')
-
-        chunk.to_csv(
-            output_file,
-            mode='w' if first_chunk else 'a',
-            index=False,
-            header=first_chunk
-        )
-        first_chunk = False
-
-        elapsed = time.time() - start_time
-        print(f"  └─ total written so far: {total_rows_written:,} rows")
-        print(f"     elapsed time: {elapsed:.1f}s\n")
+    header, ranges = chunk_ranges(input_file, chunksize * 200)  # ~200 bytes per row
+    num_workers = max(1, min(workers or os.cpu_count(), len(ranges)))
+    print(f"Chunks: {len(ranges)} | Worker processes: {num_workers}\n")
+
+    schema = pa.schema([(col, COLUMN_TYPES[col]) for col in KEEP_COLUMNS])
+    if output_file.endswith(".parquet"):
+        writer = pq.ParquetWriter(output_file, schema, compression='snappy')
+    else:
+        writer = pacsv.CSVWriter(output_file, schema)
+
+    tasks = iter([(input_file, header, start, end) for start, end in ranges])
+    sys.stdout.flush()  # don't let forked workers inherit unflushed output
+
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            pending = deque()
+            while True:
+                # Keep a bounded window of chunks in flight, collected in file order
+                while len(pending) < num_workers * 2:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    pending.append(executor.submit(clean_chunk, task))
+                if not pending:
+                    break
+
+                table, rows_before = pending.popleft().result()
+
+                chunk_idx += 1
+                total_rows_read += rows_before
+                print(f"Chunk {chunk_idx}: read {rows_before:,} rows")
+
+                rows_after = table.num_rows
+                removed = rows_before - rows_after
+                total_rows_written += rows_after
+                print(f"  ├─ removed {removed:,} invalid rows")
+                print(f"  ├─ remaining {rows_after:,} rows")
+
+                writer.write_table(table)
+
+                elapsed = time.time() - start_time
+                print(f"  └─ total written so far: {total_rows_written:,} rows")
+                print(f"     elapsed time: {elapsed:.1f}s\n")
+    finally:
+        writer.close()
 
     print(f"{'='*60}")
     print("Done cleaning!")
@@ -83,12 +158,14 @@ def initial_clean(input_file, output_file, chunksize):
 
 if __name__ == "__main__":
     CHUNK_SIZE = 500000
+    WORKERS = None
 
     if len(sys.argv) <= 2:
         print(
             "Usage: python3 initial_clean.py "
-            "<input_csv> <output_csv> "
-            "<chunk_size [default 500000]>"
+            "<input_csv> <output_csv|output_parquet> "
+            "<chunk_size [default 500000]> "
+            "<workers [default all cores]>"
         )
         sys.exit(1)
 
@@ -97,5 +174,7 @@ if __name__ == "__main__":
 
     if len(sys.argv) > 3:
         CHUNK_SIZE = int(sys.argv[3])
+    if len(sys.argv) > 4:
+        WORKERS = int(sys.argv[4])
 
-    initial_clean(INPUT_FILE, OUTPUT_FILE, CHUNK_SIZE)
+    initial_clean(INPUT_FILE, OUTPUT_FILE, CHUNK_SIZE, WORKERS)
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import io
+import mmap
 import os
 import time
-from collections import OrderedDict
+from array import array
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Bytes of input lines handled per block (cut at the next line break)
+BLOCK_SIZE = 1 << 20
+
 def parse_year(dt_str: str) -> int:
     """
     Split dataset into years
@@ -17,6 +28,17 @@ def parse_year(dt_str: str) -> int:
       - "1996-08-09"
     """
 
+    # Fast-path: every supported format starts with the 4-digit year
+    # (same result the slow path's last resort gives, without building a datetime)
+    year_str = dt_str[:4] if dt_str else ""
+    if year_str.isdigit() and len(year_str) == 4:
+        return int(year_str)
+
+    return _slow_parse_year(dt_str)
+
+def _slow_parse_year(dt_str: str) -> int:
+    """Full parse for rows not starting with a year (whitespace, odd formats, garbage)"""
+
     s = (dt_str or "").strip()
     if not s:
         raise ValueError("Empty datetime string")
@@ -41,80 +63,247 @@ def parse_year(dt_str: str) -> int:
 
     raise ValueError(f"Unrecognized datetime format: {dt_str!r}")
 
+# Fallback for rows that need CSV quoting
+_quote_buf = io.StringIO()
+_quote_writer = csv.writer(_quote_buf, lineterminator="\n")
+
+def format_row(row: list[str]) -> bytes:
+    """
+    Encode one row as a CSV line (same bytes csv.writer produces).
+    Plain rows are just joined; rows with commas, quotes or line breaks inside
+    a field go through csv.writer for proper quoting.
+    """
+    line = ",".join(row)
+    if line.count(",") == len(row) - 1 and '"' not in line and "\r" not in line and "\n" not in line:
+        return (line + "\n").encode("utf-8")
+
+    _quote_buf.seek(0)
+    _quote_buf.truncate()
+    _quote_writer.writerow(row)
+    return _quote_buf.getvalue().encode("utf-8")
+
+def take_lines(data: bytes, offsets: np.ndarray, order: np.ndarray) -> tuple[bytes, np.ndarray]:
+    """
+    Lines `order` of data (line i = data[offsets[i]:offsets[i + 1]]) one after another,
+    gathered by Arrow's take on a binary view of the lines. Returns the bytes & their offsets.
+    """
+    lines = pa.Array.from_buffers(
+        pa.large_binary(), len(offsets) - 1,
+        [None, pa.py_buffer(offsets.astype(np.int64)), pa.py_buffer(data)]
+    )
+    taken = lines.take(pa.array(order))
+    _, offsets_buf, data_buf = taken.buffers()
+    return data_buf.to_pybytes(), np.frombuffer(offsets_buf, dtype=np.int64)[:len(order) + 1]
+
+# Fixed types of the weather columns in every part file (the first lines seen
+# may hold only empty values of a text column, so these aren't inferred).
+# Readings are float64, as clean_data read them from CSV parts, not the float32
+# initial_clean's COLUMN_TYPES uses to keep the raw dataset small
+PART_COLUMN_TYPES = {
+    'datetime': pa.string(),
+    'place': pa.string(),
+    'city': pa.string(),
+    'state': pa.string(),
+    'temperature': pa.float64(),
+    'pressure': pa.float64(),
+    'dew_point': pa.float64(),
+    'humidity': pa.float64(),
+    'wind_speed': pa.float64(),
+    'wind_chill': pa.float64()
+}
+
+def sniff_schema(data: bytes, header: list[str], datetime_col: str) -> pa.Schema:
+    """
+    Column types for every part file: PART_COLUMN_TYPES for the known columns,
+    any other column inferred once from a sample of CSV lines.
+    Whole numbers & all-empty columns become float64 (a later part may hold decimals),
+    the datetime stays text (clean_data parses it).
+    """
+    sample = pacsv.read_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(column_names=header, use_threads=False),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+    )
+    fields = []
+    for field in sample.schema:
+        if field.name in PART_COLUMN_TYPES:
+            field = field.with_type(PART_COLUMN_TYPES[field.name])
+        elif field.name == datetime_col or pa.types.is_temporal(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_integer(field.type) or pa.types.is_null(field.type):
+            field = field.with_type(pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
 class WriterCache:
-    def __init__(self, out_dir: str, header: list[str], max_open: int = 8, max_rows_per_file: Optional[int] = None):
+    def __init__(self, out_dir: str, header: list[str], datetime_col: str = "datetime", max_open: int = 1024, max_rows_per_file: Optional[int] = None, pending_cap: int = 65536, bad_writer=None):
         self.out_dir = out_dir
         self.header = header
+        self.datetime_col = datetime_col
         self.max_open = max_open
         self.max_rows_per_file = max_rows_per_file
 
-        # Tracks (rows_written, chunk_idx) per year
-        self._year_state: dict[int, tuple[int, int]] = {}
-
-        # Tracks the last date seen for this year (to prevent splitting mid-day)
-        self._last_date_seen: dict[int, str] = {}
-
-        # LRU cache: year -> (file handle, csv writer)
-        self._cache: "OrderedDict[int, tuple[object, csv.DictWriter]]" = OrderedDict()
-
-    def get_writer(self, year: int, current_date_str: str) -> csv.DictWriter:
-        rows_written, chunk_idx = self._year_state.get(year, (0, 0))
-        last_date = self._last_date_seen.get(year, None)
-
-        # Roll over to a new file if max_rows_per_file reached & date changed
-        should_split = False
-        if self.max_rows_per_file and rows_written >= self.max_rows_per_file:
-            if current_date_str != last_date:
-                should_split = True
-        
-        if should_split:
-            # close existing file if open
-            if year in self._cache:
-                fh, _ = self._cache.pop(year)
-                fh.close()
-            chunk_idx += 1
-            rows_written = 0
-
-        self._last_date_seen[year] = current_date_str
-
-        if year in self._cache:
-            fh, writer = self._cache.pop(year)
-            self._cache[year] = (fh, writer)  # mark as most-recent
-        else:
-            # Evict LRU if needed
+        # Rows whose values don't fit the part schema (written to bad_writer if given)
+        self.bad_writer = bad_writer
+        self.bad_rows = 0
+
+        # Column types of every part, pinned from the first lines written
+        self.schema: Optional[pa.Schema] = None
+
+        # Per-year state as parallel arrays indexed by a small year index
+        # (no tuple per row): rows written to the current part & current part number
+        self._year_to_idx: dict[int, int] = {}
+        self._years: list[int] = []
+        self._rows_written = array("q")
+        self._chunk_idx = array("q")
+
+        # Tracks the last date seen for each year (to prevent splitting mid-day)
+        self._last_date_seen: list[Optional[str]] = []
+
+        # CSV lines waiting to be written to each year's current part,
+        # converted & written as one row group once pending_cap lines are collected
+        self._pending: list[list[bytes]] = []
+        self._pending_rows: list[int] = []
+        self._pending_cap = pending_cap
+
+        # Year index -> Parquet writer of its current part (only touched when flushing).
+        # A dataset spans a few dozen years, so every writer normally stays open until the end
+        self._cache: dict[int, pq.ParquetWriter] = {}
+
+    def write_lines(self, year: int, dates: pa.Array, data: bytes, offsets: np.ndarray) -> None:
+        """
+        Queue encoded lines of `year` (in input order) with each line's date.
+        The lines are one run of bytes, line i being data[offsets[i]:offsets[i + 1]].
+        Rolls over to a new part at the first date change once max_rows_per_file is reached.
+        """
+        if self.schema is None:
+            self.schema = sniff_schema(data[offsets[0]:offsets[-1]], self.header, self.datetime_col)
+
+        idx = self._year_to_idx.get(year)
+        if idx is None:
+            idx = self._year_to_idx[year] = len(self._years)
+            self._years.append(year)
+            self._rows_written.append(0)
+            self._chunk_idx.append(0)
+            self._last_date_seen.append(None)
+            self._pending.append([])
+            self._pending_rows.append(0)
+
+        start = 0
+        n = len(dates)
+        while start < n:
+            end = n
+            if self.max_rows_per_file:
+                # First row at/after the limit whose date differs from the row before it
+                limit = start + max(self.max_rows_per_file - self._rows_written[idx], 0)
+                if limit < n:
+                    prev_date = dates[limit - 1].as_py() if limit > start else self._last_date_seen[idx]
+                    prev_dates = pa.concat_arrays([
+                        pa.array([prev_date], type=pa.string()),
+                        dates.slice(limit, n - limit - 1)
+                    ])
+                    date_changes = np.flatnonzero(
+                        pc.not_equal(dates.slice(limit), prev_dates).fill_null(True).to_numpy(zero_copy_only=False)
+                    )
+                    if len(date_changes):
+                        end = limit + date_changes[0]
+
+            if end > start:
+                self._pending[idx].append(data[offsets[start]:offsets[end]])
+                self._pending_rows[idx] += end - start
+                self._rows_written[idx] += end - start
+                self._last_date_seen[idx] = dates[end - 1].as_py()
+
+            if end < n:
+                # Roll over: finish the current part & close it if open
+                self._flush(idx)
+                if idx in self._cache:
+                    self._cache.pop(idx).close()
+                self._chunk_idx[idx] += 1
+                self._rows_written[idx] = 0
+            elif self._pending_rows[idx] >= self._pending_cap:
+                self._flush(idx)
+
+            start = end
+
+    def _to_table(self, data: bytes) -> pa.Table:
+        return pacsv.read_csv(
+            pa.py_buffer(data),
+            read_options=pacsv.ReadOptions(column_names=self.header, use_threads=False),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types=self.schema, strings_can_be_null=True)
+        )
+
+    def _convert_rows(self, rows: list[list[str]], tables: list[pa.Table]) -> None:
+        """
+        Convert rows that failed as a batch by halving it until the failing rows are
+        isolated; those are set aside as bad rows, the rest is kept in order in tables.
+        """
+        try:
+            tables.append(self._to_table(b"".join(format_row(row) for row in rows)))
+        except pa.ArrowInvalid as e:
+            if len(rows) > 1:
+                mid = len(rows) // 2
+                self._convert_rows(rows[:mid], tables)
+                self._convert_rows(rows[mid:], tables)
+                return
+            self.bad_rows += 1
+            if self.bad_writer:
+                self.bad_writer.writerow(rows[0] + [str(e)])
+
+    def _flush(self, idx: int) -> None:
+        pending = self._pending[idx]
+        if not pending:
+            return
+
+        # Taken off the queue first, so a failing batch is never converted twice
+        data = b"".join(pending)
+        pending.clear()
+        self._pending_rows[idx] = 0
+
+        try:
+            table = self._to_table(data)
+        except pa.ArrowInvalid:
+            # Some value doesn't fit its column type (e.g. text in a reading)
+            tables = []
+            self._convert_rows(list(csv.reader(io.StringIO(data.decode("utf-8"), newline=""))), tables)
+            if not tables:
+                return
+            table = pa.concat_tables(tables)
+
+        writer = self._cache.get(idx)
+        if writer is None:
+            # Close the oldest open writer only past max_open (a closed Parquet file
+            # can't be appended to, so the evicted year continues in its next part)
             while len(self._cache) >= self.max_open:
-                old_year, (old_fh, _) = self._cache.popitem(last=False)
-                old_fh.close()
+                old_idx = next(iter(self._cache))
+                self._cache.pop(old_idx).close()
+                self._chunk_idx[old_idx] += 1
+                self._rows_written[old_idx] = 0
 
             os.makedirs(self.out_dir, exist_ok=True)
-            out_path = os.path.join(self.out_dir, f"weather_{year}_part_{chunk_idx:02d}.csv")
-            file_exists = os.path.exists(out_path)
-            fh = open(out_path, "a", newline="", encoding="utf-8")
-            writer = csv.DictWriter(fh, fieldnames=self.header, extrasaction="ignore")
-
-            # Write header only once when file is first created
-            if not file_exists or os.path.getsize(out_path) == 0:
-                writer.writeheader()
+            out_path = os.path.join(self.out_dir, f"weather_{self._years[idx]}_part_{self._chunk_idx[idx]:02d}.parquet")
+            writer = pq.ParquetWriter(out_path, self.schema, compression='snappy')
+            self._cache[idx] = writer
 
-            self._cache[year] = (fh, writer)
-        
-        self._year_state[year] = (rows_written, chunk_idx)
-        return self._cache[year][1]
-
-    def increment_row(self, year: int):
-        rows_written, chunk_idx = self._year_state.get(year, (0, 0))
-        self._year_state[year] = (rows_written + 1, chunk_idx)
+        writer.write_table(table)
 
     def close_all(self) -> None:
-        for fh, _ in self._cache.values():
-            fh.close()
-        self._cache.clear()
+        try:
+            for idx in range(len(self._pending)):
+                self._flush(idx)
+        finally:
+            # Every open part is finished even if a flush failed
+            for writer in self._cache.values():
+                writer.close()
+            self._cache.clear()
 
 def split_csv_by_year(
     input_csv: str,
     out_dir: str,
     datetime_col: str = "datetime",
-    max_open: int = 8,
+    max_open: int = 1024,
     max_rows_per_file: Optional[int] = None,
     bad_rows_csv: Optional[str] = None
 ) -> None:
@@ -129,56 +318,139 @@ def split_csv_by_year(
     print(f"Output directory: {out_dir}")
     print(f"{'='*60}")
 
-    with open(input_csv, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
+    with open(input_csv, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]), None)
+        if not header:
             raise RuntimeError("CSV appears to have no header row.")
 
-        if datetime_col not in reader.fieldnames:
+        if datetime_col not in header:
             raise RuntimeError(
                 f"Missing required column {datetime_col!r}. "
-                f"Found columns: {reader.fieldnames}"
+                f"Found columns: {header}"
             )
 
-        header = reader.fieldnames
-        cache = WriterCache(out_dir=out_dir, header=header, max_open=max_open, max_rows_per_file=max_rows_per_file)
+        num_cols = len(header)
+        datetime_idx = header.index(datetime_col)
+        # Blocks are parsed by pyarrow for the datetime column only
+        read_options = pacsv.ReadOptions(column_names=header, use_threads=False)
+        parse_options = pacsv.ParseOptions(ignore_empty_lines=False)
+        convert_options = pacsv.ConvertOptions(include_columns=[datetime_col], column_types={datetime_col: pa.string()})
 
         bad_writer = None
         bad_fh = None
         if bad_rows_csv:
             bad_fh = open(bad_rows_csv, "w", newline="", encoding="utf-8")
-            bad_writer = csv.DictWriter(bad_fh, fieldnames=header + ["_error"])
-            bad_writer.writeheader()
+            bad_writer = csv.writer(bad_fh)
+            bad_writer.writerow(header + ["_error"])
+
+        cache = WriterCache(out_dir=out_dir, header=header, datetime_col=datetime_col, max_open=max_open, max_rows_per_file=max_rows_per_file, bad_writer=bad_writer)
+
+        # The rest of the file is mapped & sliced into blocks of whole lines (no per-line read)
+        pos = f.tell()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
         try:
-            for row in reader:
-                total += 1
+            while pos < len(mm):
+                block_end = mm.find(b"\n", min(pos + BLOCK_SIZE, len(mm)) - 1)
+                block_end = len(mm) if block_end < 0 else block_end + 1
+                block = mm[pos:block_end]
+                pos = block_end
+                if not block.endswith(b"\n"):
+                    block += b"\n"  # keep the file's last line terminated
+                offsets = np.r_[0, np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n")) + 1]
 
-                if total % PROGRESS_INTERVAL == 0:
+                try:
+                    dt = pacsv.read_csv(
+                        pa.py_buffer(block),
+                        read_options=read_options,
+                        parse_options=parse_options,
+                        convert_options=convert_options
+                    ).column(0).combine_chunks()
+                except pa.ArrowInvalid:
+                    dt = None
+
+                if dt is not None and len(dt) == len(offsets) - 1:
+                    # Every line is exactly one well-formed row: the raw block is forwarded as is,
+                    # year = the leading 4 digits (parse_year's fast path, for the whole block)
+                    has_year = pc.match_substring_regex(dt, r"^[0-9]{4}")
+                    years = pc.cast(
+                        pc.utf8_slice_codeunits(pc.if_else(has_year, dt, "0000"), 0, 4), pa.int64()
+                    ).to_numpy().copy()  # writable, slow rows fill in their own year
+                    dates = pc.utf8_slice_codeunits(dt, 0, 10)
+                    data = block
+                    slow_rows = (
+                        (i, next(csv.reader([block[offsets[i]:offsets[i + 1]].decode("utf-8")]), []))
+                        for i in np.flatnonzero(~has_year.to_numpy(zero_copy_only=False))
+                    )
+                    out_lines = None
+                else:
+                    # Odd block (wrong field counts, line breaks in quotes): csv module for every row
+                    rows = list(csv.reader(io.StringIO(block.decode("utf-8"), newline="")))
+                    years = np.zeros(len(rows), dtype=np.int64)
+                    raw_dates = [None] * len(rows)
+                    out_lines = [b""] * len(rows)
+                    slow_rows = enumerate(rows)
+
+                # Slow path per row: parse_year with all its fallbacks, bad rows are set aside
+                keep = np.ones(len(years), dtype=bool)
+                block_bad = 0
+                for i, row in slow_rows:
+                    keep[i] = False
+                    if not row:
+                        continue  # skip blank lines
+
+                    # Pad short / trim long rows to the header
+                    if len(row) != num_cols:
+                        row = (row + [""] * num_cols)[:num_cols]
+
+                    try:
+                        raw_date = row[datetime_idx]
+                        years[i] = parse_year(raw_date)
+                        if out_lines is not None:
+                            raw_dates[i] = raw_date[:10]
+                            out_lines[i] = format_row(row)
+                        keep[i] = True
+                    except Exception as e:
+                        block_bad += 1
+                        if bad_writer:
+                            bad_writer.writerow(row + [str(e)])
+                        # otherwise: silently skip bad row
+
+                if out_lines is not None:
+                    dates = pa.array(raw_dates, type=pa.string())
+                    data = b"".join(out_lines)
+                    offsets = np.r_[0, np.cumsum([len(line) for line in out_lines])]
+
+                # Hand each year's lines (input order kept) to the writer as one byte range
+                kept = np.flatnonzero(keep)
+                total_before = total
+                total += len(kept) + block_bad
+                bad += block_bad
+                if len(kept):
+                    order = kept[np.argsort(years[kept], kind="stable")]
+                    if len(order) < len(years) or np.any(order[1:] < order[:-1]):
+                        # Dropped rows or years out of order: gather the lines grouped by year
+                        # (the sorted input of the pipeline normally skips this)
+                        data, offsets = take_lines(data, offsets, order)
+                        dates = dates.take(order)
+                        years = years[order]
+                    group_starts = np.flatnonzero(np.r_[True, np.diff(years) != 0])
+                    for start, end in zip(group_starts, np.r_[group_starts[1:], len(years)]):
+                        cache.write_lines(int(years[start]), dates.slice(start, end - start), data, offsets[start:end + 1])
+
+                if total // PROGRESS_INTERVAL > total_before // PROGRESS_INTERVAL:
                     elapsed = time.time() - start_time
                     speed = total / elapsed if elapsed > 0 else 0
                     print(f"Processed {total:,} rows... ({speed:.0f} rows/sec)")
-
-                try:
-                    raw_date = row.get(datetime_col, "")
-                    year = parse_year(raw_date)
-                    date_only_str = raw_date[:10]
-
-                    writer = cache.get_writer(year, date_only_str)
-                    writer.writerow(row)
-                    cache.increment_row(year)
-                except Exception as e:
-                    bad += 1
-                    if bad_writer:
-                        row2 = dict(row)
-                        row2["_error"] = str(e)
-                        bad_writer.writerow(row2)
-                    # otherwise: silently skip bad row
         finally:
             cache.close_all()
+            mm.close()
             if bad_fh:
                 bad_fh.close()
 
+    # Rows set aside while converting to the part schema are counted as bad too
+    bad += cache.bad_rows
+
     total_time = time.time() - start_time
     print(f"\n{'='*60}")
     print(f"Splitting done!")
@@ -189,11 +461,11 @@ def split_csv_by_year(
     print(f"Time taken: {total_time:.2f}s")
 
 def main():
-    ap = argparse.ArgumentParser(description="Split a large weather CSV into per-year CSVs.")
+    ap = argparse.ArgumentParser(description="Split a large weather CSV into per-year Parquet files.")
     ap.add_argument("--input", required=True, help="Path to input CSV (on NFS).")
-    ap.add_argument("--outdir", required=True, help="Directory to write split CSVs (on NFS).")
+    ap.add_argument("--outdir", required=True, help="Directory to write split Parquet files (on NFS).")
     ap.add_argument("--datetime-col", default="datetime", help="Datetime column name (default: datetime).")
-    ap.add_argument("--max-open", type=int, default=8, help="Max number of output files kept open (default: 8).")
+    ap.add_argument("--max-open", type=int, default=1024, help="Max number of output files kept open (default: 1024).")
     ap.add_argument("--max-rows-per-file", type=int, default=None, help="Max rows per year file before splitting into part files.")
     ap.add_argument("--bad-rows", default=None, help="Optional path to write rows that fail parsing.")
     args = ap.parse_args()
@@ -1,109 +1,142 @@
 import sys
-import pandas as pd
+import polars as pl
 import numpy as np
+from numba import njit, prange
 import os
 import time
 
+@njit(parallel=True, fastmath=True, cache=True)
+def _hi_kernel(t, h, out):
+    """
+    Single-pass Rothfusz regression over every row, writing into `out`.
+    Same formula as the NWS scalar version, fused so no temporaries are made.
+    Both formulas are evaluated & blended with selects so the loop vectorizes.
+    """
+    for i in prange(t.shape[0]):
+        humidity = h[i]
+
+        # Convert Celsius to Fahrenheit for the formula
+        temp_f = (t[i] * 9/5) + 32
+
+        # Simple formula for lower temperatures
+        hi_f = 0.5 * (temp_f + 61.0 + ((temp_f - 68.0) * 1.2) + (humidity * 0.094))
+
+        # Full Rothfusz regression, computed for every row
+        hi_full = (-42.379 + 
+                   2.04901523 * temp_f + 
+                   10.14333127 * humidity - 
+                   0.22475541 * temp_f * humidity - 
+                   0.00683783 * temp_f * temp_f - 
+                   0.05481717 * humidity * humidity + 
+                   0.00122874 * temp_f * temp_f * humidity + 
+                   0.00085282 * temp_f * humidity * humidity - 
+                   0.00000199 * temp_f * temp_f * humidity * humidity)
+
+        # Adjustments for specific conditions, also always computed
+        # (sqrt argument clamped so out-of-range rows don't produce NaN, they're masked anyway)
+        adj_low = ((13 - humidity) / 4) * np.sqrt(max(17 - abs(temp_f - 95), 0.0) / 17)
+        adj_high = ((humidity - 85) / 10) * ((87 - temp_f) / 5)
+        m_low = (humidity < 13) & (temp_f >= 80) & (temp_f <= 112)
+        m_high = (humidity > 85) & (temp_f >= 80) & (temp_f <= 87)
+        hi_full = hi_full - (adj_low if m_low else 0.0) + (adj_high if m_high else 0.0)
+
+        # If heat index is >= 80°F, use the full regression (selects, no branches)
+        hi_f = hi_full if hi_f >= 80 else hi_f
+
+        # Convert back to Celsius
+        out[i] = (hi_f - 32) * 5/9
+
 def calculate_heat_index(temp_c, humidity):
     """
     Calculate heat index using the Rothfusz regression (NWS formula).
     
     Args:
-        temp_c: Temperature in Celsius
-        humidity: Relative humidity (0-100)
+        temp_c: Array of temperatures in Celsius
+        humidity: Array of relative humidity (0-100)
     
     Returns:
-        Heat index in Celsius
+        Array of heat index in Celsius
     """
-    # Convert Celsius to Fahrenheit for the formula
-    temp_f = (temp_c * 9/5) + 32
-    
-    # Simple formula for lower temperatures
-    hi_f = 0.5 * (temp_f + 61.0 + ((temp_f - 68.0) * 1.2) + (humidity * 0.094))
-    
-    # If heat index is >= 80°F, use the full Rothfusz regression
-    if hi_f >= 80:
-        hi_f = (-42.379 + 
-                2.04901523 * temp_f + 
-                10.14333127 * humidity - 
-                0.22475541 * temp_f * humidity - 
-                0.00683783 * temp_f * temp_f - 
-                0.05481717 * humidity * humidity + 
-                0.00122874 * temp_f * temp_f * humidity + 
-                0.00085282 * temp_f * humidity * humidity - 
-                0.00000199 * temp_f * temp_f * humidity * humidity)
-        
-        # Adjustments for specific conditions
-        if humidity < 13 and 80 <= temp_f <= 112:
-            adjustment = ((13 - humidity) / 4) * np.sqrt((17 - abs(temp_f - 95)) / 17)
-            hi_f -= adjustment
-        elif humidity > 85 and 80 <= temp_f <= 87:
-            adjustment = ((humidity - 85) / 10) * ((87 - temp_f) / 5)
-            hi_f += adjustment
-    
-    # Convert back to Celsius
-    hi_c = (hi_f - 32) * 5/9
-    return hi_c
+    out = np.empty(len(temp_c), dtype=np.float64)
+    _hi_kernel(temp_c, humidity, out)
+    return out
 
 def calculate_monthly_heat_index(input_file, output_file):
     """
     Calculate monthly heat index statistics from weather data.
     
     Args:
-        input_file: Path to input CSV file
-        output_file: Path to output CSV file
+        input_file: Path to input Parquet file
+        output_file: Path to output Parquet file
     """
     t_start = time.time()
 
-    # Read CSV
-    df = pd.read_csv(input_file)
+    # Read only the needed columns, readings as float32
+    # (plenty for a 2-decimal result & half the memory traffic for the kernel)
+    df = (
+        pl.scan_parquet(input_file)
+        .select([
+            'state',
+            'datetime',
+            pl.col('temperature').cast(pl.Float32),
+            pl.col('humidity').cast(pl.Float32)
+        ])
+        .collect()
+    )
     t_read = time.time()
     print(f"Disk I/O (Read) Time: {t_read - t_start:.4f} seconds")
-    print(f"Rows after reading CSV: {len(df)}")
-    
-    # Parse datetime
-    df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
-    df = df.dropna(subset=['datetime'])
-    
-    # Drop rows with missing temperature or humidity
-    df = df.dropna(subset=['temperature', 'humidity'])
+    print(f"Rows after reading Parquet: {len(df)}")
     
-    # Extract year and month
-    df['year'] = df['datetime'].dt.year
-    df['month'] = df['datetime'].dt.month
+    # Drop rows with missing datetime, temperature or humidity
+    df = (
+        df.drop_nulls(subset=['datetime', 'temperature', 'humidity'])
+        .drop_nans(subset=['temperature', 'humidity'])
+    )
     
-    # Calculate heat index for each row
+    # Calculate heat index for all rows at once
     print("Calculating heat index for all rows...")
-    df['heat_index'] = df.apply(
-        lambda row: calculate_heat_index(row['temperature'], row['humidity']), 
-        axis=1
+    heat_index = calculate_heat_index(
+        df['temperature'].to_numpy(),
+        df['humidity'].to_numpy()
     )
     
-    # Group by state, year, and month
+    # Pack year & month into one int32 key (months since year 0),
+    # so the groupby hashes 2 keys per row instead of 3
+    month_key = (df['datetime'].dt.year() * 12 + df['datetime'].dt.month() - 1).cast(pl.Int32)
+
+    # Group by state, year, and month (multithreaded hash aggregation)
     print("Aggregating monthly statistics by state...")
     monthly_stats = (
-        df.groupby(['state', 'year', 'month'])['heat_index']
-        .agg(['min', 'max', 'mean', 'count'])
-        .reset_index()
+        pl.DataFrame({
+            'state': df['state'],
+            'month_key': month_key,
+            'heat_index': heat_index
+        })
+        .group_by(['state', 'month_key'])
+        .agg([
+            pl.col('heat_index').min().round(2).alias('min_heat_index'),
+            pl.col('heat_index').max().round(2).alias('max_heat_index'),
+            pl.col('heat_index').mean().round(2).alias('avg_heat_index'),
+            pl.len().alias('sample_count')
+        ])
+        .sort(['state', 'month_key'])
+        # Unpack the key back into year & month
+        .select([
+            'state',
+            (pl.col('month_key') // 12).alias('year'),
+            (pl.col('month_key') % 12 + 1).alias('month'),
+            'min_heat_index',
+            'max_heat_index',
+            'avg_heat_index',
+            'sample_count'
+        ])
     )
-    
-    # Rename columns
-    monthly_stats.columns = ['state', 'year', 'month', 'min_heat_index', 
-                             'max_heat_index', 'avg_heat_index', 'sample_count']
-    
-    # Round heat index values
-    monthly_stats['min_heat_index'] = monthly_stats['min_heat_index'].round(2)
-    monthly_stats['max_heat_index'] = monthly_stats['max_heat_index'].round(2)
-    monthly_stats['avg_heat_index'] = monthly_stats['avg_heat_index'].round(2)
-    
-    # Sort by state, year, month
-    monthly_stats = monthly_stats.sort_values(['state', 'year', 'month']).reset_index(drop=True)
 
     t_process = time.time()
     print(f"Calculation Time: {t_process - t_read:.4f} seconds")
     
-    # Save to CSV
-    monthly_stats.to_csv(output_file, index=False)
+    # Save to Parquet
+    monthly_stats.write_parquet(output_file, compression='snappy')
 
     t_end = time.time()
     print(f"Total Execution Time: {t_end - t_start:.4f} seconds")
@@ -115,7 +148,7 @@ def calculate_monthly_heat_index(input_file, output_file):
     
     # Summary statistics
     print(f"\n=== Overall Statistics ===")
-    print(f"States covered: {monthly_stats['state'].nunique()}")
+    print(f"States covered: {monthly_stats['state'].n_unique()}")
     print(f"Date range: {monthly_stats['year'].min()}-{monthly_stats['month'].min():02d} to {monthly_stats['year'].max()}-{monthly_stats['month'].max():02d}")
     print(f"Highest heat index recorded: {monthly_stats['max_heat_index'].max():.2f}°C")
     print(f"Lowest heat index recorded: {monthly_stats['min_heat_index'].min():.2f}°C")
@@ -123,7 +156,7 @@ def calculate_monthly_heat_index(input_file, output_file):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python task_heat_index.py <input_csv> <output_dir>")
+        print("Usage: python task_heat_index.py <input_parquet> <output_dir>")
         sys.exit(1)
     
     input_file = sys.argv[1]
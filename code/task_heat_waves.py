@@ -1,114 +1,169 @@
 import sys
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from numba import njit
 import os
 import time
+
+# Column types for writing the heat wave CSV: date32 dates come out as plain YYYY-MM-DD
+# (generate_analysis.HEAT_WAVES_READ_SCHEMA reads them back as text)
+HEAT_WAVES_WRITE_SCHEMA = pa.schema([
+    ('state', pa.string()),
+    ('start_date', pa.date32()),
+    ('end_date', pa.date32()),
+    ('duration_days', pa.int32()),
+    ('avg_temperature', pa.float64())
+])
  
-def find_heat_waves(input_file, output_file, threshold, min_days):
+@njit(cache=True)
+def detect_runs(state_codes, dates_days, temps, threshold, min_days):
+    """
+    Single pass over daily rows sorted by state, then date.
+    A heat wave is a streak of >= min_days consecutive days (same state) at or above threshold.
+
+    Returns each wave's first & last row index (inclusive) and its temperature sum.
+    """
+    n = temps.shape[0]
+    starts = np.empty(n, dtype=np.int64)
+    ends = np.empty(n, dtype=np.int64)
+    sums = np.empty(n, dtype=np.float64)
+    n_waves = 0
+
+    wave_start = -1  # -1 = not in a wave
+    wave_sum = 0.0
+
+    for i in range(n):
+        temp_ok = temps[i] >= threshold
+
+        # Streak continues only on the next day of the same state
+        if (temp_ok and wave_start >= 0
+                and state_codes[i] == state_codes[i - 1]
+                and dates_days[i] - dates_days[i - 1] == 1):
+            wave_sum += temps[i]
+            continue
+
+        # Otherwise the current streak (if any) ends at i-1
+        if wave_start >= 0 and i - wave_start >= min_days:
+            starts[n_waves] = wave_start
+            ends[n_waves] = i - 1
+            sums[n_waves] = wave_sum
+            n_waves += 1
+
+        # if today qualifies, start new wave at i
+        if temp_ok:
+            wave_start = i
+            wave_sum = temps[i]
+        else:
+            wave_start = -1
+
+    # if wave reaches end
+    if wave_start >= 0 and n - wave_start >= min_days:
+        starts[n_waves] = wave_start
+        ends[n_waves] = n - 1
+        sums[n_waves] = wave_sum
+        n_waves += 1
+
+    return starts[:n_waves], ends[:n_waves], sums[:n_waves]
+
+def find_heat_waves(input_file, output_file, threshold, min_days, verbose=False):
     t_start = time.time()
 
-    df = pd.read_csv(input_file)
+    # Read only the needed columns, temperature as float32 & state dictionary-encoded
+    table = pq.read_table(input_file, columns=['state', 'datetime', 'temperature'])
+    table = table.set_column(
+        table.schema.get_field_index('temperature'),
+        'temperature',
+        table['temperature'].cast(pa.float32())
+    )
+    table = table.set_column(
+        table.schema.get_field_index('state'),
+        'state',
+        table['state'].dictionary_encode()
+    )
+
+    # Datetime is already a typed timestamp, only drop missing ones
+    table = table.filter(pc.is_valid(table['datetime']))
+    df = table.to_pandas()
+
+    # Categories come in first-appearance order, sort them so states come out alphabetically
+    df['state'] = df['state'].cat.reorder_categories(sorted(df['state'].cat.categories))
 
     t_read = time.time()
     print(f"Disk I/O (Read) Time: {t_read - t_start:.4f} seconds")
  
-    # Parse datetime
-    df['datetime'] = pd.to_datetime(
-        df['datetime'],
-        format='%Y-%m-%d %H:%M:%S',
-        errors='coerce'
-    )
-
-    df = df.dropna(subset=['datetime'])
- 
     # Extract date (as pandas datetime for diff)
     df['date'] = df['datetime'].dt.floor('D')
  
     # 1) Hourly -> daily average temperature per state
-    daily = (
-        df.groupby(['state', 'date'])['temperature']
-        .mean()
-        .reset_index()
-        .rename(columns={'temperature': 'daily_avg_temp'})
-        .sort_values(['state', 'date'])
-        .reset_index(drop=True)
+    # (single grouped pass on the categorical state codes, sorted by state & date)
+    daily = df.groupby(['state', 'date'], observed=True, sort=True, as_index=False).agg(
+        daily_avg_temp=('temperature', 'mean')
     )
 
-    print(f"\nTotal rows in daily dataframe: {len(daily)}")
-    print(f"Number of states: {daily['state'].nunique()}")
-    print(f"States found: {daily['state'].unique()}")
-
-    heat_waves = []
-
-    # helper to save a wave
-    def record_wave(state, wave_df):
-        start_date = wave_df.iloc[0]['date']
-        end_date = wave_df.iloc[-1]['date']
-        duration_days = int((end_date - start_date).days) + 1
-        heat_waves.append({
-            'state': state,
-            'start_date': start_date.date(),
-            'end_date': end_date.date(),
-            'duration_days': duration_days,
-            'avg_temperature': round(wave_df['daily_avg_temp'].mean(), 2)
-        })
- 
-    # 2) Detect heat waves per state with REAL consecutive-day check
-    for state, state_df in daily.groupby('state'):
-        state_df = state_df.sort_values('date').reset_index(drop=True)
-
-        # Diagnostic lines
-        print(f"\n=== State: {state} ===")
-        print(f"Date range: {state_df['date'].min()} to {state_df['date'].max()}")
-        print(f"Temp range: {state_df['daily_avg_temp'].min():.2f}°C to {state_df['daily_avg_temp'].max():.2f}°C")
+    # Diagnostic lines (extra passes over daily, so only if verbose)
+    if verbose:
+        print(f"\nTotal rows in daily dataframe: {len(daily)}")
+        print(f"Number of states: {daily['state'].nunique()}")
+        print(f"States found: {daily['state'].unique()}")
+
+        # Per-state summary (one grouped pass)
+        state_summary = daily.groupby('state', observed=True).agg(
+            first_date=('date', 'min'),
+            last_date=('date', 'max'),
+            min_temp=('daily_avg_temp', 'min'),
+            max_temp=('daily_avg_temp', 'max')
+        )
+        for state, row in state_summary.iterrows():
+            print(f"\n=== State: {state} ===")
+            print(f"Date range: {row['first_date']} to {row['last_date']}")
+            print(f"Temp range: {row['min_temp']:.2f}°C to {row['max_temp']:.2f}°C")
+
+    # 2) Detect heat waves for all states in one pass with REAL consecutive-day check
+    # (daily is sorted by state, then date)
+    states = daily['state'].to_numpy()
+    dates = daily['date'].to_numpy(dtype='datetime64[D]')
+    wave_starts, wave_ends, wave_sums = detect_runs(
+        daily['state'].cat.codes.to_numpy(dtype=np.int32),
+        dates.view(np.int64),
+        daily['daily_avg_temp'].to_numpy(dtype=np.float32),
+        threshold,
+        min_days
+    )
 
-        in_wave = False
-        wave_start = 0
- 
-        for i in range(len(state_df)):
-            temp_ok = state_df.loc[i, 'daily_avg_temp'] >= threshold
- 
-            if not in_wave:
-                # start a new wave only if temp meets threshold
-                if temp_ok:
-                    in_wave = True
-                    wave_start = i
-            else:
-                # we're in a wave: check if streak should continue
-                prev_date = state_df.loc[i - 1, 'date']
-                cur_date = state_df.loc[i, 'date']
-                is_next_day = (cur_date - prev_date).days == 1
- 
-                if (not temp_ok) or (not is_next_day):
-                    # wave ends at i-1
-                    wave_df = state_df.loc[wave_start:i - 1]
-                    if len(wave_df) >= min_days:
-                        record_wave(state, wave_df)
- 
-                    # if today qualifies, start new wave at i; else end wave
-                    if temp_ok:
-                        in_wave = True
-                        wave_start = i
-                    else:
-                        in_wave = False
- 
-        # if wave reaches end
-        if in_wave:
-            wave_df = state_df.loc[wave_start:]
-            if len(wave_df) >= min_days:
-                record_wave(state, wave_df)
+    # Durations & average temperatures of all waves at once (streak days are consecutive)
+    wave_lengths = wave_ends - wave_starts + 1
+    wave_avgs = np.round(wave_sums / wave_lengths, 2)
 
     t_process = time.time()
     print(f"Processing Time: {t_process - t_read:.4f} seconds")
  
-    # 3) Output (with header even if empty)
-    if heat_waves:
-        result = pd.DataFrame(heat_waves)
-    else:
-        result = pd.DataFrame(columns=[
-            'state', 'start_date', 'end_date', 'duration_days', 'avg_temperature'
-        ])
+    # 3) Output straight from the wave arrays (header only if there are none)
+    result = pd.DataFrame({
+        'state': states[wave_starts],
+        'start_date': dates[wave_starts],
+        'end_date': dates[wave_ends],
+        'duration_days': wave_lengths,
+        'avg_temperature': wave_avgs
+    })
  
-    result.to_csv(output_file, index=False)
+    # Unquoted like the previous output, unless a state holds a comma, quote or line break
+    # (pyarrow always quotes its header, so that's written here)
+    table = pa.Table.from_pandas(result, schema=HEAT_WAVES_WRITE_SCHEMA, preserve_index=False)
+    needs_quotes = pc.any(pc.match_substring_regex(table['state'], '[",\r\n]')).as_py()
+    with open(output_file, 'wb') as out:
+        out.write((",".join(HEAT_WAVES_WRITE_SCHEMA.names) + "\n").encode())
+        pacsv.write_csv(
+            table,
+            out,
+            write_options=pacsv.WriteOptions(
+                include_header=False,
+                quoting_style="needed" if needs_quotes else "none"
+            )
+        )
 
     t_end = time.time()
     print(f"Total Execution Time: {t_end - t_start:.4f} seconds")
@@ -120,21 +175,22 @@ if __name__ == "__main__":
     THRESHOLD = 35.0
     MIN_DAYS = 3
 
-    if len(sys.argv) <= 2:
-        print("Usage: python task_heat_waves.py <input_csv> <output_dir> <threshold [default 35]> <min_days [default 3]>")
+    args = [arg for arg in sys.argv[1:] if arg != "--verbose"]
+    if len(args) < 2:
+        print("Usage: python task_heat_waves.py <input_parquet> <output_dir> <threshold [default 35]> <min_days [default 3]> [--verbose]")
         sys.exit(1)
 
-    if len(sys.argv) > 3:
-        THRESHOLD = float(sys.argv[3])
-    if len(sys.argv) > 4:
-        MIN_DAYS = int(sys.argv[4])
+    if len(args) > 2:
+        THRESHOLD = float(args[2])
+    if len(args) > 3:
+        MIN_DAYS = int(args[3])
 
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
+    input_file = args[0]
+    output_dir = args[1]
     
     base_name = os.path.basename(input_file)
-    new_name = base_name.replace("clean_", "heat_waves_", 1)
+    new_name = os.path.splitext(base_name)[0].replace("clean_", "heat_waves_", 1) + ".csv"
 
     output_file = os.path.join(output_dir, new_name)
     
-    find_heat_waves(input_file, output_file, THRESHOLD, MIN_DAYS)
+    find_heat_waves(input_file, output_file, THRESHOLD, MIN_DAYS, verbose="--verbose" in sys.argv[1:])